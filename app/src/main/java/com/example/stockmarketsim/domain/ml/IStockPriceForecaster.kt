@@ -4,6 +4,9 @@ interface IStockPriceForecaster {
     fun initialize()
     fun predict(features: DoubleArray, symbol: String? = null, date: Long? = null): Float
     fun getModelVersion(): Int
-    /** Returns the number of features the loaded model expects (e.g. 60 or 64). */
+    /**
+     * Returns the flattened number of features the loaded model expects
+     * (60, 64, or 300 for a [60 timesteps x 5 features] multi-factor sequence).
+     */
     fun getExpectedFeatureCount(): Int = 60
 }
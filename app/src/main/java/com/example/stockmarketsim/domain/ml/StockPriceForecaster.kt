@@ -51,7 +51,8 @@ class StockPriceForecaster @Inject constructor(
     }
 
     // Dynamic input buffer — lazily allocated to match actual feature count
-    // Supports both 60 (LSTM log returns) and 64 (multi-factor: log returns + TA indicators)
+    // Supports 60 (LSTM log returns), 64 (multi-factor: log returns + TA indicators)
+    // and 300 (60 timesteps x 5 features, written timestep-major)
     private var inputBuffer: ByteBuffer? = null
     private var currentFeatureCount = 0
     // Output: [1, 1] float = 4 bytes
@@ -123,8 +124,9 @@ class StockPriceForecaster @Inject constructor(
         if (interpreter == null) initialize()
         return try {
             val inputTensor = interpreter?.getInputTensor(0)
-            val shape = inputTensor?.shape() // e.g. [1, 64, 1] or [1, 60, 1]
-            shape?.getOrNull(1) ?: 60  // Second dimension is the feature count
+            val shape = inputTensor?.shape() // e.g. [1, 60, 5], [1, 64, 1] or [1, 60, 1]
+            // Flattened feature count = product of all non-batch dimensions (60x5 → 300)
+            shape?.drop(1)?.takeIf { it.isNotEmpty() }?.fold(1) { acc, dim -> acc * dim } ?: 60
         } catch (e: Exception) {
             60  // Default fallback for old 60-feature models
         }
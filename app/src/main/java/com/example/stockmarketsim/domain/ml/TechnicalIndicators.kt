@@ -109,22 +109,26 @@ object TechnicalIndicators {
     
     /**
      * Computes Relative Volume (Today's Volume vs 20-day Average)
+     * Returns neutral 1.0 if any bar in the window (or today) has no volume — index
+     * tickers report partial zero volume, which would otherwise yield 0 or huge spikes.
      */
     fun calculateRelativeVolumeZeroAlloc(
         volumes: DoubleArray,
         endIdx: Int,
         period: Int = 20
     ): Double {
-         if (endIdx < period) return 1.0
+         // Needs `period` history bars plus today
+         if (endIdx <= period) return 1.0
          
          var sumVol = 0.0
          // Don't include "today" in the historical avg for true relative volume benchmark
          for (i in endIdx - period - 1 until endIdx - 1) {
+             if (volumes[i] <= 0.0) return 1.0
              sumVol += volumes[i]
          }
          val avgVol = sumVol / period
          val currentVol = volumes[endIdx - 1]
          
-         return if (avgVol > 0.0) currentVol / avgVol else 1.0
+         return if (currentVol > 0.0) currentVol / avgVol else 1.0
     }
 }
@@ -7,6 +7,7 @@ import com.example.stockmarketsim.data.remote.IndianApiSource
 import kotlinx.coroutines.async
 import kotlinx.coroutines.awaitAll
 import kotlinx.coroutines.coroutineScope
+import kotlin.math.abs
 
 class MultiFactorMLStrategy(
     private val forecaster: IStockPriceForecaster,
@@ -16,6 +17,25 @@ class MultiFactorMLStrategy(
     override val name = "Multi-Factor ML (Deep Neural Net)"
     override val description = "Combines Price Action, Volatility, Sentiment, and Fundamentals into a unified probability model."
 
+    companion object {
+        /** Timesteps and per-timestep features of the sequence model input ([1, 60, 5]). */
+        const val SEQUENCE_STEPS = 60
+        const val FEATURES_PER_STEP = 5
+
+        /**
+         * Sequence features are fed as (x - offset) * scale so all five span a similar range
+         * under the model's per-tensor int8 input quantization. Must match train_stock_model.py
+         * FEATURE_OFFSETS / FEATURE_SCALES. Legacy flat models keep the unscaled layout.
+         */
+        val SEQUENCE_FEATURE_OFFSETS = doubleArrayOf(0.0, 0.5, 1.0, 0.0, 1.0)
+        val SEQUENCE_FEATURE_SCALES = doubleArrayOf(100.0, 4.0, 10.0, 100.0, 1.0)
+        
+        private const val ATR_RSI_PERIOD = 14
+        private const val SMA_FAST = 50
+        private const val SMA_SLOW = 200
+        private const val REL_VOL_PERIOD = 20
+    }
+
     override suspend fun calculateallocation(
         candidates: List<String>,
         marketData: Map<String, List<StockQuote>>,
@@ -31,35 +51,18 @@ class MultiFactorMLStrategy(
                 // Need at least 61 days for 60 log returns
                 if (currentIdx < 61) return@async null
                 
-                // Query the loaded model's expected input size (60 or 64)
+                // Query the loaded model's expected input size (60, 64 or 60x5 = 300)
                 val expectedFeatures = forecaster.getExpectedFeatureCount()
                 
                 // === FEATURE VECTOR (adapts to model shape) ===
                 // [0-59]   60 daily log returns: ln(P_t / P_{t-1})
                 // [60-63]  (only if model expects 64) TA indicators: RSI, SMA Ratio, ATR%, RelVol
+                // 300-feature sequence models use the per-timestep layout in buildSequenceFeatures()
                 
-                val features = DoubleArray(expectedFeatures)
-                
-                // Part 1: 60-day Log Return Sequence (always present)
-                val startIdx = currentIdx - 60
-                for (i in 0 until 60) {
-                    val p_t = history[startIdx + i + 1].close
-                    val p_prev = history[startIdx + i].close
-                    features[i] = kotlin.math.ln(p_t / p_prev)
-                }
-                
-                // Part 2: Technical Indicators (only if model expects 64 features)
-                if (expectedFeatures >= 64) {
-                    val windowSize = currentIdx + 1
-                    val closes = DoubleArray(windowSize) { history[it].close }
-                    val highs = DoubleArray(windowSize) { history[it].high }
-                    val lows = DoubleArray(windowSize) { history[it].low }
-                    val volumes = DoubleArray(windowSize) { history[it].volume.toDouble() }
-                    
-                    features[60] = TechnicalIndicators.calculateRsiZeroAlloc(closes, windowSize, 14) / 100.0
-                    features[61] = TechnicalIndicators.calculateSmaRatioZeroAlloc(closes, windowSize, 50, 200)
-                    features[62] = TechnicalIndicators.calculateAtrPctZeroAlloc(highs, lows, closes, windowSize, 14)
-                    features[63] = TechnicalIndicators.calculateRelativeVolumeZeroAlloc(volumes, windowSize, 20)
+                val features = if (expectedFeatures == SEQUENCE_STEPS * FEATURES_PER_STEP) {
+                    buildSequenceFeatures(history, currentIdx)
+                } else {
+                    buildFlatFeatures(history, currentIdx, expectedFeatures)
                 }
                 
                 // Fetch fundamentals (real API → Yahoo → cache → skip)
@@ -113,6 +116,126 @@ class MultiFactorMLStrategy(
         return@coroutineScope top10.associate { it.first to weight }
     }
 
+    /** Builds the legacy flat 60-feature (log returns) or 64-feature (+ 4 TA indicators) input. */
+    private fun buildFlatFeatures(history: List<StockQuote>, currentIdx: Int, expectedFeatures: Int): DoubleArray {
+        val features = DoubleArray(expectedFeatures)
+        
+        // Part 1: 60-day Log Return Sequence (always present)
+        val startIdx = currentIdx - 60
+        for (i in 0 until 60) {
+            val p_t = history[startIdx + i + 1].close
+            val p_prev = history[startIdx + i].close
+            features[i] = kotlin.math.ln(p_t / p_prev)
+        }
+        
+        // Part 2: Technical Indicators (only if model expects 64 features)
+        if (expectedFeatures >= 64) {
+            val windowSize = currentIdx + 1
+            val closes = DoubleArray(windowSize) { history[it].close }
+            val highs = DoubleArray(windowSize) { history[it].high }
+            val lows = DoubleArray(windowSize) { history[it].low }
+            val volumes = DoubleArray(windowSize) { history[it].volume.toDouble() }
+            
+            features[60] = TechnicalIndicators.calculateRsiZeroAlloc(closes, windowSize, 14) / 100.0
+            features[61] = TechnicalIndicators.calculateSmaRatioZeroAlloc(closes, windowSize, 50, 200)
+            features[62] = TechnicalIndicators.calculateAtrPctZeroAlloc(highs, lows, closes, windowSize, 14)
+            features[63] = TechnicalIndicators.calculateRelativeVolumeZeroAlloc(volumes, windowSize, 20)
+        }
+        return features
+    }
+
+    /**
+     * Builds a [SEQUENCE_STEPS x FEATURES_PER_STEP] input flattened timestep-major, matching
+     * train_stock_model.py create_sequences_multi_factor(): for each of the last 60 bars k,
+     * [log return, RSI/100, SMA Ratio, ATR%, RelVol] over bars up to and including k — the
+     * same windows as TechnicalIndicators called with endIdx = k + 1 — each rescaled with
+     * SEQUENCE_FEATURE_OFFSETS / SEQUENCE_FEATURE_SCALES.
+     *
+     * The SMA-50/200, 14-bar gain/loss/TR and 20-bar volume sums are primed once and slid
+     * forward one bar per timestep: O(SMA_SLOW + SEQUENCE_STEPS) per symbol instead of
+     * re-running every indicator from scratch at each of the 60 timesteps.
+     */
+    private fun buildSequenceFeatures(history: List<StockQuote>, currentIdx: Int): DoubleArray {
+        val features = DoubleArray(SEQUENCE_STEPS * FEATURES_PER_STEP)
+        val firstBar = currentIdx - SEQUENCE_STEPS + 1
+        // Earliest bar any window of firstBar reaches back to (SMA-200 is the longest)
+        val fromBar = maxOf(0, firstBar - SMA_SLOW)
+        
+        var fastSum = 0.0
+        var slowSum = 0.0
+        var gainSum = 0.0
+        var lossSum = 0.0
+        var trSum = 0.0
+        var volSum = 0.0      // volumes [k-20, k-1] (today excluded, as in calculateRelativeVolumeZeroAlloc)
+        var zeroVolBars = 0   // volume-less bars in [k-20, k]
+        
+        for (k in fromBar..currentIdx) {
+            val bar = history[k]
+            
+            // SMA windows [k-n+1, k]
+            fastSum += bar.close
+            if (k - SMA_FAST >= fromBar) fastSum -= history[k - SMA_FAST].close
+            slowSum += bar.close
+            if (k - SMA_SLOW >= fromBar) slowSum -= history[k - SMA_SLOW].close
+            
+            // 14-bar price change and True Range windows [k-13, k]
+            if (k >= 1) {
+                val change = bar.close - history[k - 1].close
+                if (change > 0) gainSum += change else lossSum -= change
+            }
+            trSum += trueRange(history, k)
+            val expired = k - ATR_RSI_PERIOD
+            if (expired >= fromBar) {
+                if (expired >= 1) {
+                    val change = history[expired].close - history[expired - 1].close
+                    if (change > 0) gainSum -= change else lossSum += change
+                }
+                trSum -= trueRange(history, expired)
+            }
+            
+            // 20-bar volume window
+            if (k - 1 >= fromBar) volSum += history[k - 1].volume.toDouble()
+            if (bar.volume <= 0L) zeroVolBars++
+            val volExpired = k - REL_VOL_PERIOD - 1
+            if (volExpired >= fromBar) {
+                volSum -= history[volExpired].volume.toDouble()
+                if (history[volExpired].volume <= 0L) zeroVolBars--
+            }
+            
+            if (k < firstBar) continue
+            
+            // Same guards and neutral defaults as the TechnicalIndicators helpers
+            val rsi = when {
+                k < ATR_RSI_PERIOD -> 50.0
+                lossSum <= 0.0 -> 100.0
+                else -> 100.0 - (100.0 / (1.0 + gainSum / lossSum))
+            }
+            val slowSma = slowSum / SMA_SLOW
+            val smaRatio = if (k < SMA_SLOW - 1 || slowSma == 0.0) 1.0 else (fastSum / SMA_FAST) / slowSma
+            val atrPct = if (k < ATR_RSI_PERIOD || bar.close <= 0.0) 0.0 else (trSum / ATR_RSI_PERIOD) / bar.close
+            val relVol = if (k < REL_VOL_PERIOD || zeroVolBars > 0) 1.0 else bar.volume / (volSum / REL_VOL_PERIOD)
+            
+            val base = (k - firstBar) * FEATURES_PER_STEP
+            features[base] = kotlin.math.ln(bar.close / history[k - 1].close)
+            features[base + 1] = rsi / 100.0
+            features[base + 2] = smaRatio
+            features[base + 3] = atrPct
+            features[base + 4] = relVol
+            for (f in 0 until FEATURES_PER_STEP) {
+                features[base + f] = (features[base + f] - SEQUENCE_FEATURE_OFFSETS[f]) * SEQUENCE_FEATURE_SCALES[f]
+            }
+        }
+        return features
+    }
+    
+    private fun trueRange(history: List<StockQuote>, k: Int): Double {
+        val bar = history[k]
+        val hl = bar.high - bar.low
+        if (k == 0) return hl
+        val prevClose = history[k - 1].close
+        return maxOf(hl, abs(bar.high - prevClose), abs(bar.low - prevClose))
+    }
+
     override suspend fun getSignal(symbol: String, history: List<StockQuote>, currentIdx: Int): TradeSignal {
         // Fallback for single stock testing (not typically used in the portfolio simulation loop)
         return TradeSignal.HOLD
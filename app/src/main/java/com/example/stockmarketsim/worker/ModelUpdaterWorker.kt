@@ -31,8 +31,10 @@ class ModelUpdaterWorker @AssistedInject constructor(
     private val MODEL_FILE_NAME = "stock_model.tflite"
     
     // In production, this would be an S3 bucket or Firebase Storage URL
-    // We are pointing this to the latest metadata release on the GitHub 'main' branch
-    private val OTA_METADATA_URL = "https://raw.githubusercontent.com/opsjerry/StockMarketSim/main/model_metadata.json"
+    // We are pointing this to the latest metadata release on the GitHub 'main' branch.
+    // v2 carries "input_schema"; the legacy model_metadata.json stays frozen on the last
+    // flat-input model so installs that predate the schema gate never fetch a 60x5 model.
+    private val OTA_METADATA_URL = "https://raw.githubusercontent.com/opsjerry/StockMarketSim/main/model_metadata_v2.json"
 
     private suspend fun broadcastLog(msg: String) {
         try {
@@ -66,8 +68,17 @@ class ModelUpdaterWorker @AssistedInject constructor(
             val latestVersion = metadata.getString("version")   // e.g. "20260301.13" — CI emits as unquoted Double
             val downloadUrl = metadata.getString("download_url")
             val expectedSha256 = metadata.getString("sha256")
+            val inputSchema = metadata.optString("input_schema", "")
             
-            Log.d(TAG, "Found latest model version: $latestVersion")
+            Log.d(TAG, "Found latest model version: $latestVersion (input schema: ${inputSchema.ifEmpty { "legacy" }})")
+
+            // Refuse models whose input layout this build cannot feed: the forecaster would
+            // throw on every run and MultiFactorMLStrategy would see NaN for every stock.
+            if (!isSupportedInputSchema(inputSchema)) {
+                Log.w(TAG, "Skipping model v$latestVersion: unsupported input schema '$inputSchema'.")
+                broadcastLog("[INFO] ⏭️ Model v$latestVersion needs a newer app version. Keeping current model.")
+                return@withContext Result.success()
+            }
 
             // Migration-safe version read:
             // Existing installs stored version as Int via putInt(). Calling getString() on an
@@ -158,6 +169,18 @@ class ModelUpdaterWorker @AssistedInject constructor(
     }
 
     companion object {
+        /** Input layouts MultiFactorMLStrategy can build: flat 60 / 64 features, or 60 timesteps x 5. */
+        val SUPPORTED_INPUT_SCHEMAS = setOf("flat60", "flat64", "seq60x5")
+
+        /**
+         * Whether an OTA model's declared input schema can be fed by this build.
+         * A missing schema means a legacy flat model published before the field existed.
+         *
+         * Exposed as a companion function so it can be unit-tested without Android Context.
+         */
+        fun isSupportedInputSchema(schema: String?): Boolean =
+            schema.isNullOrEmpty() || schema in SUPPORTED_INPUT_SCHEMAS
+
         /**
          * Resolves the currently stored model version string in a migration-safe way.
          *
@@ -85,4 +85,21 @@ class TechnicalIndicatorsTest {
         val relVol = TechnicalIndicators.calculateRelativeVolumeZeroAlloc(volumes, volumes.size, 5)
         assertEquals(2.0, relVol, 0.0)
     }
+
+    @Test
+    fun `test Relative Volume is neutral when any bar in the window has no volume`() {
+        // Index tickers (e.g. ^NSEI) report partial zero volume
+        val zeroInHistory = doubleArrayOf(100.0, 0.0, 100.0, 100.0, 100.0, 200.0)
+        val zeroToday = doubleArrayOf(100.0, 100.0, 100.0, 100.0, 100.0, 0.0)
+        
+        assertEquals(1.0, TechnicalIndicators.calculateRelativeVolumeZeroAlloc(zeroInHistory, zeroInHistory.size, 5), 0.0)
+        assertEquals(1.0, TechnicalIndicators.calculateRelativeVolumeZeroAlloc(zeroToday, zeroToday.size, 5), 0.0)
+    }
+    
+    @Test
+    fun `test Relative Volume without a full window plus today returns neutral 1_0`() {
+        // endIdx == period leaves no room for today + `period` history bars
+        val volumes = DoubleArray(5) { 100.0 }
+        assertEquals(1.0, TechnicalIndicators.calculateRelativeVolumeZeroAlloc(volumes, volumes.size, 5), 0.0)
+    }
 }
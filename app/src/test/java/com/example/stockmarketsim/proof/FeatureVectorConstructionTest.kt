@@ -3,6 +3,7 @@ package com.example.stockmarketsim.proof
 import com.example.stockmarketsim.data.remote.IndianApiSource
 import com.example.stockmarketsim.data.remote.IndianApiFundamentals
 import com.example.stockmarketsim.domain.ml.IStockPriceForecaster
+import com.example.stockmarketsim.domain.ml.TechnicalIndicators
 import com.example.stockmarketsim.domain.model.StockQuote
 import com.example.stockmarketsim.domain.strategy.MultiFactorMLStrategy
 import kotlinx.coroutines.runBlocking
@@ -25,6 +26,10 @@ import kotlin.math.abs
  *   [61]    SMA Ratio 50/200 (~1.0 centered)
  *   [62]    ATR% = ATR(14) / lastClose
  *   [63]    Relative Volume vs 20-day average
+ *
+ * Sequence models with a [1, 60, 5] input receive 300 features, timestep-major:
+ *   [t*5 + 0..4]  log return, RSI/100, SMA Ratio, ATR%, RelVol as of bar t,
+ *                 each as (x - SEQUENCE_FEATURE_OFFSETS[f]) * SEQUENCE_FEATURE_SCALES[f]
  */
 class FeatureVectorConstructionTest {
 
@@ -196,4 +201,118 @@ class FeatureVectorConstructionTest {
             abs(lastLogReturn) < 0.1
         )
     }
+
+    // =========================================================================
+    // Gap 3d — Sequence Layout (60 timesteps x 5 features)
+    // =========================================================================
+
+    @Test
+    fun `sequence model receives 300 timestep-major features with log return first`() = runBlocking {
+        val history = linearHistory(250)
+        val capturingForecaster = CapturingForecaster(featureCount = 300)
+        val strategy = MultiFactorMLStrategy(capturingForecaster, mockApiSource)
+
+        strategy.calculateallocation(listOf("TEST.NS"), mapOf("TEST.NS" to history), mapOf("TEST.NS" to history.lastIndex))
+
+        val features = capturingForecaster.capturedFeatures
+        assertNotNull("Forecaster should have been called", features)
+        assertEquals("Sequence model path should produce 60 x 5 = 300 elements", 300, features!!.size)
+
+        val startIdx = history.lastIndex - 60
+        for (t in 0 until 60) {
+            val expected = scaled(0, ln(history[startIdx + t + 1].close / history[startIdx + t].close))
+            assertEquals("Log return at timestep $t should be at feature[${t * 5}]",
+                expected, features[t * 5], 1e-9)
+            assertTrue("RSI at timestep $t must be normalized to [0, 1]", unscaled(1, features[t * 5 + 1]) in 0.0..1.0)
+        }
+    }
+
+    @Test
+    fun `last sequence timestep carries the same TA indicators as the 64-feature layout`() = runBlocking {
+        val history = linearHistory(250)
+        val cursors = mapOf("TEST.NS" to 220) // leave future candles after the cursor
+
+        val flatForecaster = CapturingForecaster(featureCount = 64)
+        MultiFactorMLStrategy(flatForecaster, mockApiSource)
+            .calculateallocation(listOf("TEST.NS"), mapOf("TEST.NS" to history), cursors)
+        val sequenceForecaster = CapturingForecaster(featureCount = 300)
+        MultiFactorMLStrategy(sequenceForecaster, mockApiSource)
+            .calculateallocation(listOf("TEST.NS"), mapOf("TEST.NS" to history), cursors)
+
+        val flat = flatForecaster.capturedFeatures!!
+        val sequence = sequenceForecaster.capturedFeatures!!
+        val last = 59 * 5
+        assertEquals("Last log return", scaled(0, flat[59]), sequence[last], 1e-9)
+        for (k in 0 until 4) {
+            assertEquals("TA indicator $k at last timestep must match flat slot ${60 + k}",
+                scaled(k + 1, flat[60 + k]), sequence[last + 1 + k], 1e-9)
+        }
+    }
+
+    @Test
+    fun `sliding-window sequence features match per-bar TechnicalIndicators calls`() = runBlocking {
+        val history = noisyHistory()
+        val closes = DoubleArray(history.size) { history[it].close }
+        val highs = DoubleArray(history.size) { history[it].high }
+        val lows = DoubleArray(history.size) { history[it].low }
+        val volumes = DoubleArray(history.size) { history[it].volume.toDouble() }
+
+        for (cursor in listOf(61, 75, 120, 199, 230, history.lastIndex)) {
+            val capturingForecaster = CapturingForecaster(featureCount = 300)
+            MultiFactorMLStrategy(capturingForecaster, mockApiSource)
+                .calculateallocation(listOf("TEST.NS"), mapOf("TEST.NS" to history), mapOf("TEST.NS" to cursor))
+            val features = capturingForecaster.capturedFeatures!!
+
+            for (t in 0 until 60) {
+                val k = cursor - 59 + t
+                val endIdx = k + 1
+                val expected = doubleArrayOf(
+                    ln(closes[k] / closes[k - 1]),
+                    TechnicalIndicators.calculateRsiZeroAlloc(closes, endIdx, 14) / 100.0,
+                    TechnicalIndicators.calculateSmaRatioZeroAlloc(closes, endIdx, 50, 200),
+                    TechnicalIndicators.calculateAtrPctZeroAlloc(highs, lows, closes, endIdx, 14),
+                    TechnicalIndicators.calculateRelativeVolumeZeroAlloc(volumes, endIdx, 20)
+                )
+                for (f in 0 until 5) {
+                    assertEquals("cursor=$cursor timestep=$t feature=$f",
+                        scaled(f, expected[f]), features[t * 5 + f], 1e-9)
+                }
+            }
+        }
+    }
+
+    @Test
+    fun `scaled sequence features share a comparable range for int8 input quantization`() = runBlocking {
+        // One per-tensor int8 scale covers all 5 features: none may sit orders of magnitude
+        // below the others (raw log return / ATR% are ~0.01 next to RelVol ~1).
+        val history = noisyHistory()
+        val capturingForecaster = CapturingForecaster(featureCount = 300)
+        MultiFactorMLStrategy(capturingForecaster, mockApiSource)
+            .calculateallocation(listOf("TEST.NS"), mapOf("TEST.NS" to history), mapOf("TEST.NS" to history.lastIndex))
+        val features = capturingForecaster.capturedFeatures!!
+
+        for (f in listOf(0, 3, 4)) { // log return, ATR%, RelVol vary on every noisy bar
+            val peak = (0 until 60).maxOf { abs(features[it * 5 + f]) }
+            assertTrue("Feature $f peak |x| = $peak should be within [0.1, 10]", peak in 0.1..10.0)
+        }
+        assertTrue("All scaled features bounded", features.all { abs(it) < 10.0 })
+    }
+
+    /** Noisy prices + volume-less stretches (at the start and mid-series) exercise every indicator guard. */
+    private fun noisyHistory(): List<StockQuote> {
+        val rng = kotlin.random.Random(42)
+        var price = 100.0
+        return (0 until 300).map { i ->
+            price *= 1.0 + (rng.nextDouble() - 0.5) * 0.03
+            val volume = if (i < 30 || i in 150..160) 0L else 500_000L + rng.nextLong(500_000L)
+            StockQuote("TEST.NS", baseDate + i * 86400000L, price, price * (1.0 + rng.nextDouble() * 0.02),
+                price * (1.0 - rng.nextDouble() * 0.02), price, volume)
+        }
+    }
+
+    private fun scaled(f: Int, raw: Double) =
+        (raw - MultiFactorMLStrategy.SEQUENCE_FEATURE_OFFSETS[f]) * MultiFactorMLStrategy.SEQUENCE_FEATURE_SCALES[f]
+
+    private fun unscaled(f: Int, x: Double) =
+        x / MultiFactorMLStrategy.SEQUENCE_FEATURE_SCALES[f] + MultiFactorMLStrategy.SEQUENCE_FEATURE_OFFSETS[f]
 }
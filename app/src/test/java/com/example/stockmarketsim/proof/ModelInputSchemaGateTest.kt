@@ -0,0 +1,46 @@
+package com.example.stockmarketsim.proof
+
+import com.example.stockmarketsim.domain.strategy.MultiFactorMLStrategy
+import com.example.stockmarketsim.worker.ModelUpdaterWorker
+import org.junit.Assert.*
+import org.junit.Test
+
+/**
+ * REGRESSION SUITE: ModelUpdaterWorker — OTA Input Schema Gate
+ *
+ * model_metadata_v2.json declares the published model's "input_schema". The worker must
+ * refuse a model whose input layout this build cannot feed; otherwise the interpreter
+ * throws on every run and MultiFactorMLStrategy sees NaN for every stock.
+ *
+ * All tests are pure JVM — no Android context or Robolectric needed.
+ */
+class ModelInputSchemaGateTest {
+
+    @Test
+    fun `sequence model schema is supported`() {
+        assertTrue(ModelUpdaterWorker.isSupportedInputSchema("seq60x5"))
+    }
+
+    @Test
+    fun `legacy flat schemas are supported`() {
+        assertTrue(ModelUpdaterWorker.isSupportedInputSchema("flat60"))
+        assertTrue(ModelUpdaterWorker.isSupportedInputSchema("flat64"))
+    }
+
+    @Test
+    fun `missing schema is treated as a legacy flat model`() {
+        assertTrue("null schema (field absent)", ModelUpdaterWorker.isSupportedInputSchema(null))
+        assertTrue("empty schema (optString default)", ModelUpdaterWorker.isSupportedInputSchema(""))
+    }
+
+    @Test
+    fun `unknown future schemas are refused`() {
+        assertFalse(ModelUpdaterWorker.isSupportedInputSchema("seq120x8"))
+        assertFalse(ModelUpdaterWorker.isSupportedInputSchema("SEQ60X5"))
+    }
+
+    @Test
+    fun `seq60x5 matches the sequence layout MultiFactorMLStrategy builds`() {
+        assertEquals("seq${MultiFactorMLStrategy.SEQUENCE_STEPS}x${MultiFactorMLStrategy.FEATURES_PER_STEP}", "seq60x5")
+    }
+}
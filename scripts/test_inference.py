@@ -1,12 +1,17 @@
 import numpy as np
 import tensorflow as tf
 
+SEQ_LENGTH = 60
+FEATURES_PER_STEP = 5
+
 def test_inference():
-    # Build LSTM Model (same as train_stock_model.py)
+    # Build Causal CNN Model (same as train_stock_model.py)
     model = tf.keras.Sequential([
-        tf.keras.layers.LSTM(64, return_sequences=True, input_shape=(60, 1)),
+        tf.keras.layers.Conv1D(64, kernel_size=5, padding='causal', activation='relu',
+                               input_shape=(SEQ_LENGTH, FEATURES_PER_STEP)),
         tf.keras.layers.Dropout(0.2),
-        tf.keras.layers.LSTM(32, return_sequences=False),
+        tf.keras.layers.Conv1D(32, kernel_size=5, padding='causal', dilation_rate=2, activation='relu'),
+        tf.keras.layers.GlobalAveragePooling1D(),
         tf.keras.layers.Dropout(0.2),
         tf.keras.layers.Dense(1)
     ])
@@ -15,12 +20,13 @@ def test_inference():
     # to check the scale of predictions
     model.compile(optimizer='adam', loss=tf.keras.losses.Huber())
     
+    shape = (1, SEQ_LENGTH, FEATURES_PER_STEP)
     test_cases = [
-        ("All Zeros", np.zeros((1, 60, 1), dtype=np.float32)),
-        ("All Ones", np.ones((1, 60, 1), dtype=np.float32)),
-        ("Small Values (0.01)", np.full((1, 60, 1), 0.01, dtype=np.float32)),
-        ("Negative Values (-0.01)", np.full((1, 60, 1), -0.01, dtype=np.float32)),
-        ("Random Noise (-0.05 to 0.05)", np.random.uniform(-0.05, 0.05, (1, 60, 1)).astype(np.float32))
+        ("All Zeros", np.zeros(shape, dtype=np.float32)),
+        ("All Ones", np.ones(shape, dtype=np.float32)),
+        ("Small Values (0.01)", np.full(shape, 0.01, dtype=np.float32)),
+        ("Negative Values (-0.01)", np.full(shape, -0.01, dtype=np.float32)),
+        ("Random Noise (-0.05 to 0.05)", np.random.uniform(-0.05, 0.05, shape).astype(np.float32))
     ]
     
     for name, data in test_cases:
@@ -4,17 +4,22 @@ import tensorflow as tf
 import yfinance as yf
 import pandas as pd
 import os
+import sys
 
 # --- CONFIGURATION ---
 TICKER = "^NSEI"  # NIFTY 50 (Indian Market) — was SPY, fixed per Expert Review #1
 HISTORY_YEARS = 5 # Increased for better training
 SEQ_LENGTH = 60  # Days of lookback
+REPRESENTATIVE_SAMPLES = 200  # Training windows used to calibrate int8 quantization
+QUANT_MAX_ABS_ERROR = 1e-3  # Max |int8 - float| prediction gap on X_val (0.1% vs the 0.4% trade threshold)
 
 # Calculate absolute path from script location (works from any directory)
 SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
 PROJECT_ROOT = os.path.dirname(SCRIPT_DIR)  # Go up from scripts/ to project root
 MODEL_PATH = os.path.join(PROJECT_ROOT, "app", "src", "main", "assets", "stock_model.tflite")
 
+OHLCV_COLUMNS = ["Open", "High", "Low", "Close", "Volume"]
+
 def fetch_data():
     print(f"Fetching data for {TICKER}...")
     try:
@@ -31,28 +36,24 @@ def fetch_data():
         df = yf.download(TICKER, period=f"{HISTORY_YEARS}y", progress=False, session=session)
         if df.empty:
             print("WARNING: No data fetched. Check internet connection.")
-            return np.zeros(0)
+            return pd.DataFrame(columns=OHLCV_COLUMNS)
             
-        # Handle new yfinance MultiIndex output for single ticker
+        # Handle new yfinance MultiIndex output for single ticker: columns are (field, ticker)
         if isinstance(df.columns, pd.MultiIndex):
-            # In newer yfinance, df['Close'] might be a DataFrame with columns [TICKER]
-            if TICKER in df['Close'].columns:
-                close_data = df['Close'][TICKER]
-            else:
-                # Fallback to the first available column
-                close_data = df['Close'].iloc[:, 0]
-        else:
-            close_data = df['Close']
+            tickers = df.columns.get_level_values(1)
+            # Fallback to the first available ticker if TICKER is not present
+            df = df.xs(TICKER if TICKER in tickers else tickers[0], axis=1, level=1)
             
-        # Ensure we have a 1D array and remove any NaNs
-        values = close_data.values.flatten()
-        values = values[~np.isnan(values)]
+        # Real OHLCV bars — drop rows with missing prices. Index volume can be absent
+        # (reported as 0/NaN); calculate_relative_volume treats those bars as volume-less.
+        ohlcv = df[OHLCV_COLUMNS].dropna(subset=["Open", "High", "Low", "Close"])
+        ohlcv = ohlcv.assign(Volume=ohlcv["Volume"].fillna(0.0))
         
-        print(f"Fetched {len(values)} price points.")
-        return values
+        print(f"Fetched {len(ohlcv)} OHLCV bars.")
+        return ohlcv
     except Exception as e:
         print(f"ERROR fetching data: {e}")
-        return np.zeros(0)
+        return pd.DataFrame(columns=OHLCV_COLUMNS)
 
 def calculate_rsi(prices, period=14):
     """Calculate RSI for a price array, returns array of RSI values."""
@@ -61,63 +62,94 @@ def calculate_rsi(prices, period=14):
     losses = np.where(deltas < 0, -deltas, 0)
     
     rsi = np.full(len(prices), 50.0)  # Default neutral
-    for i in range(period, len(deltas)):
-        avg_gain = gains[i-period:i].mean()
-        avg_loss = losses[i-period:i].mean()
-        if avg_loss == 0:
-            rsi[i+1] = 100.0
-        else:
-            rs = avg_gain / avg_loss
-            rsi[i+1] = 100.0 - (100.0 / (1.0 + rs))
+    if len(deltas) < period:
+        return rsi
+
+    # Simple-average RSI, same window as TechnicalIndicators.calculateRsiZeroAlloc(endIdx = k + 1):
+    # rsi[k] averages the `period` price changes into bars k-period+1..k (deltas [k-period, k))
+    cs_gain = np.concatenate([[0.0], np.cumsum(gains)])
+    cs_loss = np.concatenate([[0.0], np.cumsum(losses)])
+    avg_gain = (cs_gain[period:] - cs_gain[:-period]) / period
+    avg_loss = (cs_loss[period:] - cs_loss[:-period]) / period
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        rs = avg_gain / avg_loss
+        rsi[period:] = np.where(avg_loss > 0, 100.0 - (100.0 / (1.0 + rs)), 100.0)
     return rsi
 
 def calculate_sma_ratio(prices, fast=50, slow=200):
     """Calculate SMA Ratio (fast/slow), returns array."""
     ratio = np.ones(len(prices))  # Default neutral
-    for i in range(slow, len(prices)):
-        sma_fast = prices[i-fast:i].mean()
-        sma_slow = prices[i-slow:i].mean()
-        if sma_slow > 0:
-            ratio[i] = sma_fast / sma_slow
+    if len(prices) < slow:
+        return ratio
+
+    # Rolling means via cumulative sums: SMA at bar k averages prices [k-n+1, k],
+    # same window as TechnicalIndicators.calculateSmaRatioZeroAlloc(endIdx = k + 1)
+    c = np.concatenate([[0.0], np.cumsum(prices)])
+    n = len(prices)
+    sma_fast = (c[slow:] - c[slow - fast:n + 1 - fast]) / fast
+    sma_slow = (c[slow:] - c[:n + 1 - slow]) / slow
+    np.divide(sma_fast, sma_slow, out=ratio[slow - 1:], where=sma_slow > 0)
     return ratio
 
 def calculate_atr_pct(highs, lows, closes, period=14):
     """Calculate ATR as percentage of price."""
     atr_pct = np.zeros(len(closes))
-    for i in range(period + 1, len(closes)):
-        tr_sum = 0.0
-        for j in range(i - period, i):
-            tr = max(highs[j] - lows[j], abs(highs[j] - closes[j-1]), abs(lows[j] - closes[j-1]))
-            tr_sum += tr
-        atr = tr_sum / period
-        if closes[i] > 0:
-            atr_pct[i] = atr / closes[i]
+    if len(closes) <= period:
+        return atr_pct
+
+    # True Range for bars 1..N-1 (bar 0 has no previous close)
+    hl = highs[1:] - lows[1:]
+    hc = np.abs(highs[1:] - closes[:-1])
+    lc = np.abs(lows[1:] - closes[:-1])
+    tr = np.maximum(np.maximum(hl, hc), lc)
+
+    # Rolling mean via cumulative sums: ATR at bar k averages TR of bars [k-period+1, k],
+    # same window as TechnicalIndicators.calculateAtrPctZeroAlloc(endIdx = k + 1)
+    cs = np.concatenate([[0.0], np.cumsum(tr)])
+    atr = (cs[period:] - cs[:-period]) / period
+
+    price = closes[period:]
+    np.divide(atr, price, out=atr_pct[period:], where=price > 0)
     return atr_pct
 
 def calculate_relative_volume(volumes, period=20):
     """Calculate relative volume vs N-day average."""
     rel_vol = np.ones(len(volumes))  # Default neutral
-    for i in range(period, len(volumes)):
-        avg_vol = volumes[i-period:i].mean()
-        if avg_vol > 0:
-            rel_vol[i] = volumes[i] / avg_vol
+    if len(volumes) <= period:
+        return rel_vol
+
+    # Rolling mean via cumulative sums: average of volumes [i-period, i), excluding today
+    c = np.concatenate([[0.0], np.cumsum(volumes)])
+    avg_vol = (c[period:-1] - c[:-period - 1]) / period
+
+    # Volume-less bars (index volume is partly reported as 0) make the ratio meaningless:
+    # any zero in [i-period, i] forces neutral 1.0, matching calculateRelativeVolumeZeroAlloc.
+    z = np.concatenate([[0], np.cumsum(volumes <= 0)])
+    has_volume = (z[period + 1:] - z[:-period - 1]) == 0
+    np.divide(volumes[period:], avg_vol, out=rel_vol[period:], where=has_volume)
     return rel_vol
 
-FEATURE_COUNT = 64  # 60 log returns + 4 TA indicators
+FEATURES_PER_STEP = 5  # log return + RSI + SMA Ratio + ATR% + RelVol
+
+# Per-feature (x - offset) * scale, so all five inputs span a similar ~unit range. The int8
+# model quantizes its input with one per-tensor scale: unscaled, log return and ATR% (~0.01)
+# would collapse to a few levels next to RelVol (~1+). Must match MultiFactorMLStrategy
+# SEQUENCE_FEATURE_OFFSETS / SEQUENCE_FEATURE_SCALES.
+FEATURE_OFFSETS = np.array([0.0, 0.5, 1.0, 0.0, 1.0])
+FEATURE_SCALES = np.array([100.0, 4.0, 10.0, 100.0, 1.0])
 
 def create_sequences_multi_factor(data, seq_length):
-    """Create sequences with 64 features: 60 log returns + RSI + SMA Ratio + ATR% + RelVol."""
-    data = data.flatten() if hasattr(data, 'flatten') else data
+    """Create (seq_length, 5) sequences: per bar [log return, RSI, SMA Ratio, ATR%, RelVol].
+
+    `data` is an OHLCV DataFrame (see fetch_data). Every indicator at bar k uses bars up to
+    and including k, the same windows MultiFactorMLStrategy.buildSequenceFeatures uses on device.
+    Features are rescaled with FEATURE_OFFSETS / FEATURE_SCALES; targets stay raw log returns.
+    """
     if len(data) < 2:
         return np.array([]), np.array([])
     
-    # For multi-factor, we need OHLCV data. Since we only have close prices from yfinance,
-    # we approximate: High ≈ Close * 1.01, Low ≈ Close * 0.99, Volume = synthetic
-    # This is a bootstrap approximation — replace with real OHLCV when available.
-    closes = data
-    highs = closes * 1.01   # Approximate
-    lows = closes * 0.99    # Approximate
-    volumes = np.random.uniform(800000, 1200000, len(closes))  # Synthetic volume
+    highs, lows, closes, volumes = data[["High", "Low", "Close", "Volume"]].to_numpy(dtype=np.float64).T
     
     log_returns = np.diff(np.log(closes))
     
@@ -127,33 +159,78 @@ def create_sequences_multi_factor(data, seq_length):
     atr_pct = calculate_atr_pct(highs, lows, closes, 14)  # 0.01-0.10 range
     rel_vol = calculate_relative_volume(volumes, 20)    # ~1.0 centered
     
-    xs, ys = [], []
-    for i in range(len(log_returns) - seq_length):
-        # 60 log returns
-        log_ret_seq = log_returns[i:(i + seq_length)]
-        
-        # 4 TA indicators at the END of the window
-        idx = i + seq_length  # Current position in original price array
-        ta_features = np.array([
-            rsi[idx],
-            sma_ratio[idx],
-            atr_pct[idx],
-            rel_vol[idx]
-        ])
-        
-        # Concatenate: [60 log returns, RSI, SMA_Ratio, ATR%, RelVol]
-        x_combined = np.concatenate([log_ret_seq.flatten(), ta_features])
-        
-        y_raw = log_returns[i + seq_length]
+    n_samples = len(log_returns) - seq_length
+    if n_samples <= 0:
+        return np.array([]), np.array([])
+
+    # Per-bar feature rows for price index 1..N-1: log return into the bar + TA as of that bar.
+    bar_features = np.column_stack([log_returns, rsi[1:], sma_ratio[1:], atr_pct[1:], rel_vol[1:]])
+    bar_features = (bar_features - FEATURE_OFFSETS) * FEATURE_SCALES
+
+    # Windows of seq_length consecutive bars -> (n_samples, seq_length, 5), timestep-major.
+    # Indicators are computed in float64; the model consumes float32, so cast during the
+    # single layout copy instead of letting Keras convert a float64 tensor on every fit.
+    windows = np.lib.stride_tricks.sliding_window_view(bar_features, seq_length, axis=0)[:n_samples]
+    xs = np.ascontiguousarray(windows.transpose(0, 2, 1), dtype=np.float32)
+    ys = log_returns[seq_length:].astype(np.float32)
+
+    return xs, ys
+
+def enable_mixed_precision():
+    """Use a mixed-precision policy on GPUs with tensor cores; CPU (CI) stays float32."""
+    gpus = tf.config.list_physical_devices('GPU')
+    if not gpus:
+        return 'float32'
+    capability = tf.config.experimental.get_device_details(gpus[0]).get('compute_capability', (0, 0))
+    if capability >= (8, 0):
+        policy = 'mixed_bfloat16'  # Ampere+: bf16 needs no loss scaling
+    elif capability >= (7, 0):
+        policy = 'mixed_float16'   # Volta/Turing tensor cores; Keras adds loss scaling on compile
+    else:
+        return 'float32'
+    tf.keras.mixed_precision.set_global_policy(policy)
+    return policy
+
+def build_model():
+    """Causal CNN over [SEQ_LENGTH, FEATURES_PER_STEP] multi-factor sequences."""
+    # Causal convolutions see only past bars and run in parallel over the time axis
+    # (no recurrent dependency), and convert to pure TFLite builtins.
+    return tf.keras.Sequential([
+        # Layer 1: Short-horizon patterns over 60 timesteps of multi-factor features
+        tf.keras.layers.Conv1D(64, kernel_size=5, padding='causal', activation='relu',
+                               input_shape=(SEQ_LENGTH, FEATURES_PER_STEP)),
+        tf.keras.layers.Dropout(0.2),
         
-        xs.append(x_combined)
-        ys.append(y_raw)
+        # Layer 2: Dilated conv widens the receptive field for cross-feature patterns
+        tf.keras.layers.Conv1D(32, kernel_size=5, padding='causal', dilation_rate=2, activation='relu'),
+        tf.keras.layers.GlobalAveragePooling1D(),
+        tf.keras.layers.Dropout(0.2),
         
-    return np.array(xs), np.array(ys)
+        # Output Layer: Predicted next-day log return (float32 even under mixed precision
+        # so the Huber loss is computed at full precision)
+        tf.keras.layers.Dense(1, dtype='float32')
+    ])
+
+def quantization_error(tflite_model, model, X):
+    """Max absolute gap between the converted TFLite model and the Keras model over X."""
+    interpreter = tf.lite.Interpreter(model_content=tflite_model)
+    interpreter.allocate_tensors()
+    input_index = interpreter.get_input_details()[0]['index']
+    output_index = interpreter.get_output_details()[0]['index']
+
+    # One window at a time: the converted graph keeps the Keras batch dimension of 1
+    tflite_preds = np.empty(len(X), dtype=np.float32)
+    for i, sample in enumerate(X):
+        interpreter.set_tensor(input_index, sample[np.newaxis, ...])
+        interpreter.invoke()
+        tflite_preds[i] = interpreter.get_tensor(output_index)[0, 0]
+
+    keras_preds = model.predict(X, verbose=0)[:, 0]
+    return float(np.max(np.abs(tflite_preds - keras_preds)))
 
 def train_model():
     print(f"--- STARTING MULTI-FACTOR TRAINING [Target: {MODEL_PATH}] ---")
-    print(f"    Market: {TICKER} | Features: {FEATURE_COUNT} (60 log returns + 4 TA indicators)")
+    print(f"    Market: {TICKER} | Input: {SEQ_LENGTH} timesteps x {FEATURES_PER_STEP} features (log return + 4 TA indicators)")
     
     # 1. Prepare Data
     raw_data = fetch_data()
@@ -162,15 +239,12 @@ def train_model():
         print("Insufficient data for training. Skipping.")
         return
 
-    # Generate Multi-Factor Sequences (64 features per sample)
+    # Generate Multi-Factor Sequences [samples, SEQ_LENGTH, FEATURES_PER_STEP]
     X, y = create_sequences_multi_factor(raw_data, SEQ_LENGTH)
     
     if len(X) == 0:
         print("No sequences generated.")
         return
-
-    # Reshape for LSTM [samples, features, 1]
-    X = X.reshape((X.shape[0], X.shape[1], 1))
     
     # Split Train/Val (80/20) - preserve time order!
     split_idx = int(len(X) * 0.8)
@@ -178,24 +252,17 @@ def train_model():
     X_val, y_val = X[split_idx:], y[split_idx:]
     
     print(f"Training Samples: {len(X_train)}, Validation Samples: {len(X_val)}")
-    print(f"Feature Shape: {X_train.shape[1]} features x 1")
+    print(f"Feature Shape: {X_train.shape[1]} timesteps x {X_train.shape[2]} features")
 
-    # 2. Build LSTM Model (Multi-Factor Architecture)
-    model = tf.keras.Sequential([
-        # Layer 1: Learn from 64 multi-factor features
-        tf.keras.layers.LSTM(64, return_sequences=True, input_shape=(FEATURE_COUNT, 1)),
-        tf.keras.layers.Dropout(0.2),
-        
-        # Layer 2: Learn complex cross-feature patterns
-        tf.keras.layers.LSTM(32, return_sequences=False),
-        tf.keras.layers.Dropout(0.2),
-        
-        # Output Layer: Predicted next-day log return
-        tf.keras.layers.Dense(1)
-    ])
+    # 2. Build Causal CNN Model (Multi-Factor Architecture)
+    policy = enable_mixed_precision()
+    print(f"Precision Policy: {policy}")
+    model = build_model()
     
     # Huber Loss is robust to outliers (market crashes/spikes)
-    model.compile(optimizer='adam', loss=tf.keras.losses.Huber())
+    # jit_compile: XLA fuses the conv/pool/dense train step into fewer kernels — the model is
+    # small and batch_size=32, so per-op dispatch dominates otherwise.
+    model.compile(optimizer='adam', loss=tf.keras.losses.Huber(), jit_compile=True)
     
     # 3. Train
     print("Training Model...")
@@ -204,16 +271,36 @@ def train_model():
     
     # 4. Save & Convert to TFLite
     print("Converting to TFLite...")
+    if policy != 'float32':
+        # Export from a pure float32 copy (weights are float32 variables under mixed precision)
+        # so the converter never sees float16/bfloat16 casts.
+        tf.keras.mixed_precision.set_global_policy('float32')
+        export_model = build_model()
+        export_model.set_weights(model.get_weights())
+        model = export_model
     converter = tf.lite.TFLiteConverter.from_keras_model(model)
     
-    # FIX: LSTM layers use dynamic tensor ops that require SELECT_TF_OPS
-    converter.target_spec.supported_ops = [
-        tf.lite.OpsSet.TFLITE_BUILTINS,
-        tf.lite.OpsSet.SELECT_TF_OPS
-    ]
-    converter._experimental_lower_tensor_list_ops = False
-    
+    # Conv1D/pooling/dense lower to TFLite builtins — no SELECT_TF_OPS (Flex) runtime needed
+    converter.target_spec.supported_ops = [tf.lite.OpsSet.TFLITE_BUILTINS]
+
+    # Post-training int8 quantization, calibrated on real training windows.
+    # Input/output stay float32: StockPriceForecaster writes/reads float ByteBuffers.
+    calibration = X_train[-REPRESENTATIVE_SAMPLES:]
+    def representative_dataset():
+        for sample in calibration:
+            yield [sample[np.newaxis, ...]]
+    converter.optimizations = [tf.lite.Optimize.DEFAULT]
+    converter.representative_dataset = representative_dataset
+
     tflite_model = converter.convert()
+
+    # Refuse to export a model the int8 conversion has degraded: CI then stops before
+    # publishing OTA metadata, and devices keep their current model.
+    max_error = quantization_error(tflite_model, model, X_val)
+    print(f"Quantization check: max |TFLite - Keras| on {len(X_val)} validation windows = {max_error:.6f}")
+    if max_error > QUANT_MAX_ABS_ERROR:
+        print(f"ERROR: Quantization error {max_error:.6f} exceeds {QUANT_MAX_ABS_ERROR}. Model not exported.")
+        sys.exit(1)
     
     # Ensure directory exists
     os.makedirs(os.path.dirname(MODEL_PATH), exist_ok=True)
@@ -221,7 +308,7 @@ def train_model():
     with open(MODEL_PATH, "wb") as f:
         f.write(tflite_model)
         
-    print(f"SUCCESS: Multi-Factor model ({FEATURE_COUNT} features) saved to {MODEL_PATH}")
+    print(f"SUCCESS: Multi-Factor int8 model ({SEQ_LENGTH}x{FEATURES_PER_STEP} input) saved to {MODEL_PATH}")
 
 if __name__ == "__main__":
     train_model()